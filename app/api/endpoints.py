@@ -21,16 +21,20 @@ from app.domain.models import (
     PipelineTemplate,
     ImageProcessingRequest,
     ImageProcessingResponse,
+    PageMetadata,
 )
 from app.infrastructure.dip_client import DIPClient, get_dip_client, DIPClientPort
 from app.services.pdf_processor import PDFProcessor
 from app.services.factory import get_pdf_processor, get_template_service, get_image_processing_service
 from app.services.template_service import TemplateService
 from app.services.image_processing_service import ImageProcessingService
+from app.services.encoding import b64decode, encode_images_b64
 from app.core.context import get_request_context, get_correlation_id
-import base64
+from app.core.concurrency import bounded_as_completed
 import time
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Tuple, Union
+import re
 
 import asyncio
 
@@ -40,6 +44,33 @@ import structlog
 router = APIRouter()
 logger = structlog.get_logger(__name__)
 
+# A page list such as "1, 3-5, 8": validated in one pass, then scanned per item.
+_PAGE_LIST_RE = re.compile(r"\s*\d+\s*(?:-\s*\d+\s*)?(?:,\s*\d+\s*(?:-\s*\d+\s*)?)*")
+_PAGE_ITEM_RE = re.compile(r"(\d+)\s*(?:-\s*(\d+))?")
+# Upper bound on any page number, so a range like "1-999999999" is rejected
+# before it is expanded.
+_MAX_PAGE_NUMBER = 10_000
+
+
+@lru_cache(maxsize=128)
+def _parse_page_numbers(page_numbers: str) -> Tuple[int, ...]:
+    """
+    Parses a page list like "1,3-5" into page numbers, in the order given.
+    Raises ValueError for malformed input, descending ranges, page 0 or page
+    numbers above `_MAX_PAGE_NUMBER`.
+    """
+    if not _PAGE_LIST_RE.fullmatch(page_numbers):
+        raise ValueError(f"Invalid page list: {page_numbers!r}")
+    pages: List[int] = []
+    for match in _PAGE_ITEM_RE.finditer(page_numbers):
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start or end > _MAX_PAGE_NUMBER:
+            raise ValueError(f"Invalid page range: {match.group(0)!r}")
+        pages.extend(range(start, end + 1))
+    return tuple(pages)
+
+
 @router.post("/images/process", response_model=ImageProcessingResponse)
 @limiter.limit("30/minute")
 async def process_image(
@@ -56,7 +87,7 @@ async def process_image(
     """
     try:
         # The service layer handles the core logic, making the endpoint a lean adapter.
-        response = image_service.process_image(body)
+        response = await image_service.process_image(body)
         return response
     except ValueError as e:
         # Handle specific, known errors, such as an unknown gear
@@ -90,29 +121,34 @@ async def generate(
         # --- Annotation Processing Logic ---
         if body.annotated_images:
             log.info(f"Processing {len(body.annotated_images)} annotated images.")
-            processed_images = []
+            pending_images: List[Union[bytes, str]] = []
             for annotated_image in body.annotated_images:
-                original_image_bytes = base64.b64decode(annotated_image.image_data)
-                
                 if not annotated_image.annotations:
-                    # If there are no annotations, add the original image and continue
-                    processed_images.append(base64.b64encode(original_image_bytes).decode("utf-8"))
+                    # If there are no annotations, pass the original base64 through as-is
+                    pending_images.append(annotated_image.image_data)
                     continue
 
+                original_image_bytes = b64decode(annotated_image.image_data)
+
                 # Cropping logic based on the Strategy Pattern
                 for bbox in annotated_image.annotations:
-                    log.info(f"Cropping image with bbox: {bbox.dict()}")
+                    log.info("Cropping image with bbox", bbox=bbox)
                     try:
                         cropped_image_bytes = pdf_processor.crop_image(
                             original_image_bytes, bbox
                         )
-                        processed_images.append(base64.b64encode(cropped_image_bytes).decode("utf-8"))
+                        pending_images.append(cropped_image_bytes)
                     except Exception as crop_error:
                         log.error("Failed to crop image", error=str(crop_error))
                         raise HTTPException(
                             status_code=400,
                             detail=f"Failed to process bounding box: {crop_error}"
                         )
+
+            # Encode all images in one batch, off the event loop
+            processed_images = await asyncio.to_thread(
+                encode_images_b64, pending_images
+            )
             
             # Create a new DIPRequest with the processed images
             # This replaces the original annotated_images with a flat list of cropped images
@@ -145,7 +181,7 @@ async def process_pdf(
     pdf_processor: PDFProcessor = Depends(get_pdf_processor),
     image_service: ImageProcessingService = Depends(get_image_processing_service),
 ):
-    start_time = time.time()
+    start_ns = time.monotonic_ns()
     model_name = config.default_model
     log = logger.bind(filename=pdf_file.filename, model=model_name)
     log.info("Received process_pdf request")
@@ -162,48 +198,103 @@ async def process_pdf(
     processed_page_numbers = []
     if page_numbers:
         try:
-            # Convert comma-separated string to list of ints
-            processed_page_numbers = [int(p.strip()) for p in page_numbers.split(',')]
-            log.info(f"Processing specific pages: {processed_page_numbers}")
+            processed_page_numbers = list(_parse_page_numbers(page_numbers))
+            log.info("Processing specific pages", page_numbers=processed_page_numbers)
         except ValueError:
-            log.warn("Invalid page_numbers format. Must be comma-separated integers.")
+            log.warn("Invalid page_numbers format. Must be comma-separated integers or ranges.")
             raise HTTPException(
                 status_code=400,
-                detail="Invalid page_numbers format. Must be a comma-separated list of integers.",
+                detail="Invalid page_numbers format. Must be a comma-separated list of integers or ranges (e.g. 1-3,5).",
             )
 
     try:
-        image_bytes_list, page_metadata = pdf_processor.pdf_to_images(
-            pdf_contents, page_numbers=processed_page_numbers or None
-        )
+        # Opening and validating the PDF is blocking; keep it off the event loop.
+        try:
+            page_count, pages = await asyncio.to_thread(
+                pdf_processor.pdf_to_images_iter,
+                pdf_contents,
+                page_numbers=processed_page_numbers or None,
+            )
+        except ValueError as e:
+            # A requested page past the end of the document.
+            log.warn("Invalid page_numbers for this document", error=str(e))
+            raise HTTPException(status_code=400, detail=str(e))
         log.info(
-            f"Successfully converted {len(image_bytes_list)} pages to images.",
+            f"Rendering {page_count} pages to images.",
             correlation_id=get_correlation_id(),
         )
 
         # --- Natively Asynchronous Image Preprocessing ---
-        tasks = []
-        document_id = get_correlation_id() if len(image_bytes_list) > 1 else None
+        document_id = get_correlation_id() if page_count > 1 else None
+        preprocessing_steps = pipeline_steps.split(',') if pipeline_steps else None
+        numbered_pages = enumerate(pages)
+        render_lock = asyncio.Lock()
+        # The render currently running on a worker thread. Cancelling the task
+        # awaiting it does not stop the thread, so cleanup waits on it instead.
+        current_render: Optional[
+            "asyncio.Future[Optional[Tuple[int, Tuple[bytes, PageMetadata]]]]"
+        ] = None
+        # Set, under the lock, once a render fails or is abandoned. No page may
+        # start rendering after that: the iterator is finished or still busy.
+        render_error: Optional[BaseException] = None
 
-        for img_bytes in image_bytes_list:
-            req = ImageProcessingRequest(
-                image_data=base64.b64encode(img_bytes).decode("utf-8"),
+        async def preprocess_next_page() -> Tuple[int, ImageProcessingResponse]:
+            nonlocal current_render, render_error
+            # Pages are rendered lazily, one at a time and in order (the iterator
+            # is not thread-safe), while earlier pages are already being
+            # preprocessed. They are passed on as raw bytes, without base64.
+            async with render_lock:
+                if render_error is not None:
+                    raise render_error
+                # next() returns None at the end rather than raising StopIteration,
+                # which cannot be set on a Future and would leave it unresolved.
+                current_render = asyncio.ensure_future(
+                    asyncio.to_thread(next, numbered_pages, None)
+                )
+                try:
+                    numbered_page = await asyncio.shield(current_render)
+                    if numbered_page is None:
+                        raise RuntimeError(f"PDF ran out of pages before page {page_count}")
+                except BaseException as e:
+                    render_error = e
+                    raise
+                index, (img_bytes, _) = numbered_page
+            return index, await image_service.process_image_bytes(
+                img_bytes,
                 gears_to_run=["image_preprocessor"],
-                preprocessing_steps=pipeline_steps.split(',') if pipeline_steps else None,
+                preprocessing_steps=preprocessing_steps,
                 document_id=document_id,
             )
-            tasks.append(image_service.process_image(req))
 
-        # Concurrently run all processing tasks
-        img_proc_responses: List[ImageProcessingResponse] = await asyncio.gather(*tasks)
+        # At most PREPROCESSING_MAX_CONCURRENCY pages are in flight; the first
+        # failure cancels the rest rather than letting them run for a request
+        # that will 500 anyway.
+        page_responses: Dict[int, ImageProcessingResponse] = {}
+        try:
+            async for index, page_response in bounded_as_completed(
+                (preprocess_next_page() for _ in range(page_count)),
+                config.PREPROCESSING_MAX_CONCURRENCY,
+            ):
+                page_responses[index] = page_response
+        finally:
+            # Close the page iterator, which closes the document and drops its
+            # reference to the upload, once no render is still using it. Every
+            # render resolves, since next() is given a default instead of raising.
+            if current_render is not None:
+                await asyncio.wait([current_render])
+            pages.close()
 
+        # Responses arrive in completion order; collect the images in page order.
         processed_images_b64 = [
             gear_result.result_data["processed_image_b64"]
-            for response in img_proc_responses
+            for response in (page_responses[index] for index in range(page_count))
             if response.results
             for gear_result in response.results
             if gear_result.gear_name == "image_preprocessor"
         ]
+        # Only the encoded pages are needed from here on. Release the upload and
+        # any step traces before waiting on the DIP service.
+        del pdf_contents, page_responses
 
         # Create a new DIPRequest with the processed images
         dip_request = DIPRequest(
@@ -222,9 +313,12 @@ async def process_pdf(
         log.info(
             "Successfully preprocessed images and generated response.",
             correlation_id=get_correlation_id(),
+            duration_ms=(time.monotonic_ns() - start_ns) // 1_000_000,
         )
         return response
 
+    except HTTPException:
+        raise
     except httpx.ReadTimeout:
         log.error("Request to DIP service timed out.")
         raise HTTPException(status_code=504, detail="Request to DIP service timed out.")
@@ -248,29 +342,34 @@ async def chat_stream(
         # --- Annotation Processing Logic ---
         if body.annotated_images:
             log.info(f"Processing {len(body.annotated_images)} annotated images.")
-            processed_images = []
+            pending_images: List[Union[bytes, str]] = []
             for annotated_image in body.annotated_images:
-                original_image_bytes = base64.b64decode(annotated_image.image_data)
-                
                 if not annotated_image.annotations:
-                    # If there are no annotations, add the original image and continue
-                    processed_images.append(base64.b64encode(original_image_bytes).decode("utf-8"))
+                    # If there are no annotations, pass the original base64 through as-is
+                    pending_images.append(annotated_image.image_data)
                     continue
 
+                original_image_bytes = b64decode(annotated_image.image_data)
+
                 # Cropping logic based on the Strategy Pattern
                 for bbox in annotated_image.annotations:
-                    log.info(f"Cropping image with bbox: {bbox.dict()}")
+                    log.info("Cropping image with bbox", bbox=bbox)
                     try:
                         cropped_image_bytes = pdf_processor.crop_image(
                             original_image_bytes, bbox
                         )
-                        processed_images.append(base64.b64encode(cropped_image_bytes).decode("utf-8"))
+                        pending_images.append(cropped_image_bytes)
                     except Exception as crop_error:
                         log.error("Failed to crop image", error=str(crop_error))
                         raise HTTPException(
                             status_code=400,
                             detail=f"Failed to process bounding box: {crop_error}"
                         )
+
+            # Encode all images in one batch, off the event loop
+            processed_images = await asyncio.to_thread(
+                encode_images_b64, pending_images
+            )
             
             # Create a new DIPRequest with the processed images
             # This replaces the original annotated_images with a flat list of cropped images
@@ -0,0 +1,60 @@
+import asyncio
+from typing import AsyncGenerator, Awaitable, Iterable, List, Set, TypeVar
+
+T = TypeVar("T")
+
+
+async def bounded_as_completed(
+    aws: Iterable[Awaitable[T]], limit: int
+) -> AsyncGenerator[T, None]:
+    """
+    Yields the results of `aws` in completion order, with at most `limit`
+    of them running at once.
+
+    Awaitables are pulled from the iterable lazily, so passing a generator
+    keeps only `limit` coroutines alive instead of materializing one task per
+    item up front. If any awaitable raises, the ones still in flight are
+    cancelled and the exception propagates to the caller; other failures that
+    finished at the same time are retrieved and dropped.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+    pending_aws = iter(aws)
+    in_flight: Set[asyncio.Future] = set()
+    # Finished futures whose results have not been handed back yet.
+    ready: List[asyncio.Future] = []
+
+    def admit(count: int) -> None:
+        for aw in pending_aws:
+            in_flight.add(asyncio.ensure_future(aw))
+            count -= 1
+            if count == 0:
+                break
+
+    try:
+        admit(limit)
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            # Refill the freed slots before handing results back, so new work
+            # starts while the caller is busy with what just finished.
+            admit(len(done))
+            ready.extend(done)
+            while ready:
+                yield ready.pop().result()
+    finally:
+        # Read the outcome of finished futures that were never yielded, so a
+        # failure completing alongside the one that propagated is not logged
+        # as "Task exception was never retrieved".
+        for future in ready:
+            if not future.cancelled():
+                future.exception()
+        for future in in_flight:
+            future.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        # Close coroutines that were never admitted so they don't warn as unawaited.
+        for aw in pending_aws:
+            if asyncio.iscoroutine(aw):
+                aw.close()
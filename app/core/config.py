@@ -1,6 +1,6 @@
 import os
 from pydantic import BaseModel
-from typing import List
+from typing import List, Literal
 from pydantic_settings import BaseSettings
 
 # Determine the project's root directory, assuming this script is in app/core
@@ -11,17 +11,98 @@ class AppConfig(BaseSettings):
     models: List[str] = ["qwen2.5vl:3b", "llava:latest"]
     DIP_BASE_URL: str = "http://ollama:11434"
     DIP_GENERATE_TIMEOUT: float = 1800.0  # 30 minutes
+    # Size of the shared connection pool to the DIP service.
+    DIP_MAX_CONNECTIONS: int = 32
+    # Ollama quantization tag appended to the default model, e.g. "q4_K_M"
+    # selects "qwen2.5vl:3b-q4_K_M" (about half the VRAM of the FP16 build).
+    # The variant must be pulled on the DIP host. Empty uses the model as listed.
+    MODEL_QUANTIZATION: str = ""
+    # Number of /api/generate responses kept in memory, keyed by model, prompt
+    # and a hash of each image. Responses are sampled, so a hit replays an
+    # earlier answer rather than a fresh one; 0 (the default) disables it.
+    DIP_RESPONSE_CACHE_SIZE: int = 0
 
     # Directory for configuration files, ensuring paths are robust
     CONFIG_DIR: str = os.path.join(PROJECT_ROOT, 'config')
 
+    # Capture input/output images and hashes for every preprocessing step.
+    # This is expensive (encode + hash + base64 per step), so it is off by default
+    # and can be enabled per request with the `X-Debug-Trace` header.
+    CAPTURE_STEP_TRACES: bool = False
+    # Include base64 JPEG previews in step traces. When off, traces carry only
+    # hashes of the raw pixel buffers, skipping two JPEG encodes per step.
+    STEP_TRACE_PREVIEWS: bool = True
+    # JPEG quality for step trace previews; they are for inspection only, so a
+    # lower quality than the final output keeps encoding and payloads cheap.
+    STEP_TRACE_JPEG_QUALITY: int = 85
+
+    # Number of gear results kept in memory, keyed by gear, steps and image hash,
+    # so repeated images (retries, duplicate pages) skip reprocessing. Each entry
+    # holds a full processed page (plus step traces when enabled), so this is
+    # off (0) by default.
+    GEAR_RESULT_CACHE_SIZE: int = 0
+    # Number of individual step outputs kept in memory, keyed by step, parameters
+    # and a hash of the input pixels. Each entry is a full decoded page, so this
+    # is off (0) by default.
+    STEP_CACHE_SIZE: int = 0
+
+    # Maximum number of images preprocessed concurrently within one batch. Each
+    # in-flight page holds its decoded arrays, so this also bounds peak memory.
+    PREPROCESSING_MAX_CONCURRENCY: int = min(os.cpu_count() or 1, 8)
+
+    # Worker processes used to rasterize PDF pages in parallel. MuPDF is not
+    # thread-safe, so 0 renders pages one after another in the calling thread.
+    PDF_RENDER_PROCESSES: int = 0
+    # Resolution PDF pages are rasterized at. 150 dpi is ample for the VLM,
+    # which downsamples large inputs, at a quarter of the pixels of 300 dpi.
+    PDF_RENDER_DPI: int = 150
+    # Longest side, in pixels, of a rendered page; larger pages are rendered at
+    # a lower zoom instead. Matches PREPROCESSING_MAX_DIMENSION by default. 0 disables it.
+    PDF_RENDER_MAX_EDGE: int = 2048
+    # Render PDF pages as single-channel grayscale, a third of the bytes to
+    # rasterize and encode. Only suitable when every prompt is about the text,
+    # so it is off by default.
+    PDF_RENDER_GRAYSCALE: bool = False
+    # Number of rendered PDF pages (JPEG bytes) kept in memory, keyed by a hash
+    # of the document, the page and the render settings, so retries and re-runs
+    # skip rasterization. Entries are compressed pages, typically a few hundred
+    # KB each. 0 disables it.
+    PDF_PAGE_CACHE_SIZE: int = 64
+
+    # Longest side, in pixels, an image is downscaled to before preprocessing.
+    # 0 keeps the original resolution.
+    PREPROCESSING_MAX_DIMENSION: int = 2048
+
+    # Worker processes for the deskew step, which is GIL-bound. 0 runs it on
+    # the default thread pool like every other step.
+    DESKEW_PROCESS_WORKERS: int = 0
+    # Longest side, in pixels, of the copy used to estimate the skew angle.
+    # The rotation itself is still applied at full resolution. 0 disables it.
+    DESKEW_ANALYSIS_MAX_DIM: int = 1024
+    # Pick deskew's Canny thresholds from the page median (+/-33%) instead of
+    # the fixed 50/200, for scans with uneven lighting.
+    DESKEW_AUTO_CANNY: bool = False
+
+    # Images up to this many pixels run cheap steps (grayscale, CLAHE, adaptive
+    # threshold) inline instead of on a worker thread. 0 always uses a thread.
+    INLINE_STEP_MAX_PIXELS: int = 250_000
+
+    # Run denoising through OpenCV's OpenCL backend when a device is available.
+    USE_OPENCL: bool = False
+    # Denoise algorithm: "bilateral" is fast and edge-preserving; "nlm"
+    # (non-local means) is marginally cleaner but 10-50x slower per pixel.
+    DENOISE_ALGORITHM: Literal["bilateral", "nlm"] = "bilateral"
+
 
 
     @property
     def default_model(self) -> str:
         if not self.models:
             raise ValueError("No models configured.")
-        return self.models[0]
+        model = self.models[0]
+        if self.MODEL_QUANTIZATION:
+            model = f"{model}-{self.MODEL_QUANTIZATION}"
+        return model
 
 settings = AppConfig()
 config = settings # for backwards compatibility if needed
\ No newline at end of file
@@ -1,5 +1,7 @@
 from contextvars import ContextVar
 from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.domain.models import RequestContext
 import uuid
 
@@ -26,4 +28,40 @@ def get_correlation_id() -> str:
         return context.correlation_id
     # Fallback to a new UUID if the context is not available,
     # though in a properly configured middleware setup, this should not happen.
-    return str(uuid.uuid4())
\ No newline at end of file
+    return str(uuid.uuid4())
+
+def is_debug_trace_enabled() -> bool:
+    """Returns True if the current request asked for full step traces."""
+    context = get_request_context()
+    return bool(context and context.debug_trace)
+
+
+class RequestContextMiddleware:
+    """
+    Creates a new request context and sets it for the current request.
+
+    This is a pure ASGI middleware so that the context variable is set in the
+    same task that runs the endpoint, without the overhead of `BaseHTTPMiddleware`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        correlation_id = headers.get("X-Correlation-ID") or str(uuid.uuid4())
+        debug_trace = headers.get("X-Debug-Trace", "").lower() in ("1", "true", "yes")
+        set_request_context(
+            RequestContext(correlation_id=correlation_id, debug_trace=debug_trace)
+        )
+
+        async def send_with_correlation_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Correlation-ID"] = correlation_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_correlation_id)
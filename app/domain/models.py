@@ -20,9 +20,9 @@ class AnnotatedImage(BaseModel):
 
 class StepMetadata(BaseModel):
     """Metadata captured for a single preprocessing step."""
-    input_hash: str = Field(..., description="MD5 hash of the input image.")
-    output_hash: str = Field(..., description="MD5 hash of the output image.")
-    processing_time_ms: float = Field(..., description="Time taken for the step in milliseconds.")
+    input_hash: str = Field(..., description="BLAKE2b (128-bit) hash of the input image.")
+    output_hash: str = Field(..., description="BLAKE2b (128-bit) hash of the output image.")
+    processing_time_ms: int = Field(..., description="Time taken for the step in whole milliseconds.")
     parameters: Dict[str, Any] = Field({}, description="Parameters used for the step.")
 
 
@@ -90,6 +90,7 @@ class DocumentMetadata(BaseModel):
 
 class RequestContext(BaseModel):
     correlation_id: str = Field(..., description="The correlation ID for the request.")
+    debug_trace: bool = Field(False, description="Whether full step traces were requested.")
 
 
 class AuditEventName(str, Enum):
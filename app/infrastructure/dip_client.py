@@ -1,4 +1,10 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 import httpx
+import orjson
 import structlog
 from pybreaker import CircuitBreaker, CircuitBreakerError
 from app.core.config import settings
@@ -17,29 +23,100 @@ logger = structlog.get_logger(__name__)
 # Fail after 3 consecutive failures, and stay open for 60 seconds
 dip_breaker = CircuitBreaker(fail_max=3, reset_timeout=60)
 
+# Request bodies carry base64 images that can run to several megabytes, so they
+# are serialized with orjson rather than httpx's stdlib json encoder.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# --- Shared HTTP Client ---
+# One pooled client per process, so concurrent page requests reuse keep-alive
+# connections to the DIP service instead of opening a new one per call.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared DIP HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            # Retries only cover failed connection attempts, so a POST that
+            # reached the server is never sent twice.
+            transport=httpx.AsyncHTTPTransport(
+                retries=2,
+                limits=httpx.Limits(
+                    max_connections=settings.DIP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DIP_MAX_CONNECTIONS,
+                ),
+            )
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Closes the shared DIP HTTP client. Called on application shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# --- Generate Response Cache ---
+# Inference takes tens of seconds per call, so identical generate requests
+# (same model, prompt and images) can be answered from memory. Ollama samples
+# with a non-zero temperature by default, so a hit replays an earlier answer;
+# the cache is therefore opt-in via DIP_RESPONSE_CACHE_SIZE.
+GenerateCacheKey = Tuple[str, str, Tuple[str, ...]]
+_generate_cache: "OrderedDict[GenerateCacheKey, DIPResponse]" = OrderedDict()
+
+def _generate_cache_key(request: DIPRequest) -> GenerateCacheKey:
+    images = tuple(
+        hashlib.blake2b(image.encode("ascii"), digest_size=16).hexdigest()
+        for image in request.images or ()
+    )
+    return request.model, request.prompt, images
+
 class DIPClient(DIPClientPort):
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, client: Optional[httpx.AsyncClient] = None):
         self.base_url = base_url
+        # Defaults to the shared process-wide client; injectable for tests.
+        self._client = client
 
-    @dip_breaker
     async def generate(self, request: DIPRequest) -> DIPResponse:
+        cache_size = settings.DIP_RESPONSE_CACHE_SIZE
+        if cache_size <= 0 or request.stream:
+            return await self._generate(request)
+
+        # Hashing several megabytes of page images is kept off the event loop.
+        key = await asyncio.to_thread(_generate_cache_key, request)
+        cached = _generate_cache.get(key)
+        if cached is not None:
+            _generate_cache.move_to_end(key)
+            logger.info("DIP response served from cache", model=request.model)
+        else:
+            cached = await self._generate(request)
+            _generate_cache[key] = cached
+            while len(_generate_cache) > cache_size:
+                _generate_cache.popitem(last=False)
+        # Callers attach per-request context to the response, so never hand
+        # out the cached instance itself.
+        return cached.model_copy()
+
+    @dip_breaker
+    async def _generate(self, request: DIPRequest) -> DIPResponse:
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "model": request.model,
-                    "prompt": request.prompt,
-                    "stream": request.stream,
-                }
-                if request.images:
-                    payload["images"] = request.images
-
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    timeout=settings.DIP_GENERATE_TIMEOUT,
-                )
-                response.raise_for_status()
-                return DIPResponse(**response.json())
+            client = self._client or get_http_client()
+            payload = {
+                "model": request.model,
+                "prompt": request.prompt,
+                "stream": request.stream,
+            }
+            if request.images:
+                payload["images"] = request.images
+
+            response = await client.post(
+                f"{self.base_url}/api/generate",
+                content=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=settings.DIP_GENERATE_TIMEOUT,
+            )
+            response.raise_for_status()
+            return DIPResponse.model_validate_json(response.content)
         except httpx.TimeoutException as e:
             logger.error("Request to DIP service timed out", exc_info=True)
             raise  # Re-raise to be caught by the circuit breaker
@@ -58,27 +135,28 @@ class DIPClient(DIPClientPort):
     @dip_breaker
     async def chat(self, request: DIPChatRequest) -> DIPChatResponse:
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "model": request.model,
-                    "messages": [],
-                    "stream": request.stream,
-                }
-                for msg in request.messages:
-                    message_payload = {"role": msg.role, "content": msg.content}
-                    if msg.annotated_images:
-                        message_payload["images"] = [
-                            img.image_data for img in msg.annotated_images
-                        ]
-                    payload["messages"].append(message_payload)
-
-                response = await client.post(
-                    f"{self.base_url}/api/chat",
-                    json=payload,
-                    timeout=3600.0,
-                )
-                response.raise_for_status()
-                return DIPChatResponse(**response.json())
+            client = self._client or get_http_client()
+            payload = {
+                "model": request.model,
+                "messages": [],
+                "stream": request.stream,
+            }
+            for msg in request.messages:
+                message_payload = {"role": msg.role, "content": msg.content}
+                if msg.annotated_images:
+                    message_payload["images"] = [
+                        img.image_data for img in msg.annotated_images
+                    ]
+                payload["messages"].append(message_payload)
+
+            response = await client.post(
+                f"{self.base_url}/api/chat",
+                content=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=3600.0,
+            )
+            response.raise_for_status()
+            return DIPChatResponse.model_validate_json(response.content)
         except httpx.TimeoutException as e:
             logger.error("Request to DIP chat service timed out", exc_info=True)
             raise
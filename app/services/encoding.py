@@ -0,0 +1,60 @@
+import functools
+import hashlib
+import io
+from typing import List, Union
+
+import pybase64
+
+# 16-byte BLAKE2b, the same digest length as MD5.
+_blake2b_128 = functools.partial(hashlib.blake2b, digest_size=16)
+
+
+def encode_images_b64(images: List[Union[bytes, str]]) -> List[str]:
+    """
+    Base64-encodes a batch of images in a single call.
+
+    Items that are already base64 strings are passed through unchanged, so
+    callers can mix untouched client images with freshly produced bytes
+    without a decode/re-encode round-trip.
+
+    Intended to be run once via `asyncio.to_thread` for a whole batch, rather
+    than hopping to a thread (or blocking the event loop) per image.
+    """
+    return [image if isinstance(image, str) else b64encode_str(image) for image in images]
+
+
+def b64encode_str(data: bytes) -> str:
+    """
+    Base64-encodes bytes straight to a `str`.
+
+    pybase64 uses a SIMD (SSSE3/AVX2) kernel and builds the string directly,
+    skipping the intermediate bytes object of `base64.b64encode(...).decode()`.
+    """
+    return pybase64.b64encode_as_string(data)
+
+
+def content_hexdigest(data: Union[bytes, memoryview]) -> str:
+    """
+    Returns a 128-bit BLAKE2b hex digest of an in-memory buffer.
+
+    The digest is only used as a content identifier, so BLAKE2b (faster than
+    MD5 in software) is used at the same 32-character length. `hashlib.file_digest`
+    hands the BytesIO's underlying buffer to the hash in a single call without
+    copying it, and the GIL is released while hashing. Other buffers (e.g. a
+    NumPy array's memoryview) are hashed in place.
+    """
+    if not isinstance(data, bytes):
+        return _blake2b_128(data).hexdigest()
+    return hashlib.file_digest(io.BytesIO(data), _blake2b_128).hexdigest()
+
+
+def b64decode(data: Union[str, bytes]) -> bytes:
+    """
+    Decodes base64 with pybase64's SIMD kernel; a drop-in for `base64.b64decode`.
+    """
+    return pybase64.b64decode(data)
+
+
+def b64_backend() -> str:
+    """Describes the active pybase64 build, e.g. whether the AVX2 kernel is in use."""
+    return pybase64.get_version()
@@ -1,3 +1,7 @@
+from functools import lru_cache
+
+from app.core.config import settings
+
 from .pdf_processor import PDFProcessor
 from .image_preprocessor import ImagePreprocessor
 from .template_service import TemplateService
@@ -5,7 +9,11 @@ from .image_processing_service import ImageProcessingService
 
 
 def get_pdf_processor() -> PDFProcessor:
-    return PDFProcessor()
+    return PDFProcessor(
+        dpi=settings.PDF_RENDER_DPI,
+        max_edge=settings.PDF_RENDER_MAX_EDGE,
+        grayscale=settings.PDF_RENDER_GRAYSCALE,
+    )
 
 def get_image_preprocessor() -> ImagePreprocessor:
     return ImagePreprocessor()
@@ -13,5 +21,7 @@ def get_image_preprocessor() -> ImagePreprocessor:
 def get_image_processing_service() -> ImageProcessingService:
     return ImageProcessingService()
 
+# Templates are read and validated once per process rather than on every request.
+@lru_cache(maxsize=None)
 def get_template_service() -> TemplateService:
     return TemplateService()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict, Type, List, Any
+from typing import Dict, Type, List, Any, Tuple
 
 from app.services.processing_gears.base import ProcessingGear
 from app.services.processing_gears.image_preprocessing_gear import ImagePreprocessingGear
@@ -15,6 +15,11 @@ GEAR_REGISTRY: Dict[str, Type[ProcessingGear]] = {
     # "vlm_classification_gear": VLMClassificationGear,
 }
 
+# --- Gear Instance Cache ---
+# Gears hold no per-request state, so one instance per (name, params) is shared
+# across requests instead of being rebuilt (along with its collaborators) each time.
+_gear_instances: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], ProcessingGear] = {}
+
 def create_gears(gear_configs: Dict[str, Dict[str, Any]]) -> List[ProcessingGear]:
     """
     Factory function to create a list of processing gear instances.
@@ -27,7 +32,8 @@ def create_gears(gear_configs: Dict[str, Dict[str, Any]]) -> List[ProcessingGear
                       dictionaries of parameters for that gear's constructor.
 
     Returns:
-        A list of instantiated processing gear objects.
+        A list of processing gear objects. Instances are shared between calls
+        with the same name and parameters.
 
     Raises:
         ValueError: If a requested gear is not found in the registry.
@@ -38,5 +44,15 @@ def create_gears(gear_configs: Dict[str, Dict[str, Any]]) -> List[ProcessingGear
         if not gear_class:
             # Robust error handling for enterprise-grade reliability
             raise ValueError(f"Unknown processing gear: '{name}'. Available gears: {list(GEAR_REGISTRY.keys())}")
-        instances.append(gear_class(**params))
+        try:
+            key = (name, tuple(sorted(params.items())))
+            hash(key)
+        except TypeError:
+            # Unhashable parameters can't be cached; build a fresh instance.
+            instances.append(gear_class(**params))
+            continue
+        gear = _gear_instances.get(key)
+        if gear is None:
+            gear = _gear_instances[key] = gear_class(**params)
+        instances.append(gear)
     return instances
\ No newline at end of file
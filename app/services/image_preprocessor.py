@@ -1,42 +1,156 @@
 import cv2
 import numpy as np
 from skimage.transform import radon
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Callable
 import io
 from PIL import Image
 import time
-import hashlib
-import base64
 import asyncio
 import functools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import math
+import threading
+from app.core.config import settings
+from app.core.context import is_debug_trace_enabled
 from app.domain.models import ProcessingStepResult, StepMetadata
+from app.services.encoding import b64encode_str, content_hexdigest
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# --- Deskew Process Pool ---
+# OpenCV releases the GIL, so most steps scale fine on threads. The Radon
+# transform in deskew is largely GIL-bound NumPy/scikit-image work, so it can
+# optionally run in worker processes (DESKEW_PROCESS_WORKERS > 0).
+_deskew_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_deskew_pool() -> Optional[ProcessPoolExecutor]:
+    global _deskew_pool
+    if _deskew_pool is None and settings.DESKEW_PROCESS_WORKERS > 0:
+        _deskew_pool = ProcessPoolExecutor(max_workers=settings.DESKEW_PROCESS_WORKERS)
+    return _deskew_pool
+
+def shutdown_deskew_pool() -> None:
+    """Stops the deskew worker processes, if any were started."""
+    global _deskew_pool
+    if _deskew_pool is not None:
+        _deskew_pool.shutdown(cancel_futures=True)
+        _deskew_pool = None
+
+@functools.lru_cache(maxsize=None)
+def _opencl_enabled() -> bool:
+    """Whether OpenCL offload was requested and a device is actually available."""
+    return settings.USE_OPENCL and cv2.ocl.haveOpenCL()
+
+# CLAHE objects keep internal work buffers and are not safe to share between
+# threads, so each worker thread builds one on first use and reuses it.
+_thread_local = threading.local()
+
+def _get_clahe() -> cv2.CLAHE:
+    clahe = getattr(_thread_local, "clahe", None)
+    if clahe is None:
+        clahe = _thread_local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+# --- Step Result Cache ---
+# Steps are deterministic in (input pixels, parameters, output-affecting settings),
+# so with STEP_CACHE_SIZE > 0 repeated inputs (retries, pipelines sharing a prefix)
+# skip the OpenCV call.
+StepSettings = Tuple[str, bool, int, bool]
+StepCacheKey = Tuple[str, Tuple[int, ...], str, str, Tuple[Tuple[str, Any], ...], StepSettings]
+_step_cache: "OrderedDict[StepCacheKey, np.ndarray]" = OrderedDict()
+
+def _step_settings() -> StepSettings:
+    """The settings that change what a step outputs, so a change is a cache miss."""
+    return (
+        settings.DENOISE_ALGORITHM,
+        settings.DESKEW_AUTO_CANNY,
+        settings.DESKEW_ANALYSIS_MAX_DIM,
+        settings.USE_OPENCL,
+    )
+
+def _array_digest(img: np.ndarray) -> str:
+    return content_hexdigest(np.ascontiguousarray(img).data)
+
+async def _call_step(func, preprocessor: "ImagePreprocessor", img: np.ndarray, kwargs: Dict[str, Any]) -> np.ndarray:
+    """Runs a step body, serving repeated inputs from the step cache when enabled."""
+    cache_size = settings.STEP_CACHE_SIZE
+    if cache_size <= 0:
+        return await func(preprocessor, img, **kwargs)
+
+    key: StepCacheKey = (
+        func.__name__,
+        img.shape,
+        img.dtype.str,
+        await asyncio.to_thread(_array_digest, img),
+        tuple(sorted(kwargs.items())),
+        _step_settings(),
+    )
+    cached = _step_cache.get(key)
+    if cached is not None:
+        _step_cache.move_to_end(key)
+        return cached
+
+    processed_img = await func(preprocessor, img, **kwargs)
+    # Cached arrays are shared between requests, so guard them against in-place edits.
+    processed_img.flags.writeable = False
+    _step_cache[key] = processed_img
+    while len(_step_cache) > cache_size:
+        _step_cache.popitem(last=False)
+    return processed_img
+
 def instrument_step(func):
     """
     Decorator to instrument a preprocessing step, capturing metadata such as
     timing, image hashes, and parameters.
+
+    Encoding, hashing and base64-encoding the input and output images is only
+    done when step traces are enabled, either globally via
+    `CAPTURE_STEP_TRACES` or for the current request via `X-Debug-Trace`.
     """
     @functools.wraps(func)
     async def wrapper(self, img: np.ndarray, **kwargs) -> Tuple[np.ndarray, ProcessingStepResult]:
         step_name = func.__name__
-        start_time = time.time()
+        kwargs.pop('return_type', None)
+        start_ns = time.perf_counter_ns()
+
+        if not (settings.CAPTURE_STEP_TRACES or is_debug_trace_enabled()):
+            processed_img = await _call_step(func, self, img, kwargs)
+            processing_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+
+            # Skip validation; the empty trace fields are known to be well-formed.
+            result = ProcessingStepResult.model_construct(
+                step_name=step_name,
+                input_image="",
+                output_image="",
+                metadata=StepMetadata.model_construct(
+                    input_hash="",
+                    output_hash="",
+                    processing_time_ms=processing_time_ms,
+                    parameters=kwargs,
+                ),
+            )
+            # Skip building the event dict when INFO is filtered out anyway.
+            if logger.is_enabled_for(logging.INFO):
+                logger.info(
+                    "Preprocessing step completed",
+                    step_name=step_name,
+                    processing_time_ms=processing_time_ms,
+                )
+            return processed_img, result
 
         # Capture input state
-        input_bytes = await asyncio.to_thread(self._cv2_to_bytes, img)
-        input_hash = hashlib.md5(input_bytes).hexdigest()
+        input_hash, input_preview = await asyncio.to_thread(self._trace_image, img)
 
         # Execute the actual processing step
-        kwargs.pop('return_type', None)
-        processed_img = await func(self, img, **kwargs)
+        processed_img = await _call_step(func, self, img, kwargs)
 
         # Capture output state
-        output_bytes = await asyncio.to_thread(self._cv2_to_bytes, processed_img)
-        output_hash = hashlib.md5(output_bytes).hexdigest()
-        
-        processing_time_ms = (time.time() - start_time) * 1000
+        output_hash, output_preview = await asyncio.to_thread(self._trace_image, processed_img)
+
+        processing_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
         # Assemble metadata
         metadata = StepMetadata(
@@ -48,17 +162,23 @@ def instrument_step(func):
 
         result = ProcessingStepResult(
             step_name=step_name,
-            input_image=base64.b64encode(input_bytes).decode('utf-8'),
-            output_image=base64.b64encode(output_bytes).decode('utf-8'),
+            input_image=input_preview,
+            output_image=output_preview,
             metadata=metadata,
         )
         
-        logger.info(
-            f"Step '{step_name}' completed in {processing_time_ms:.2f}ms. "
-            f"Input: {input_hash}, Output: {output_hash}"
-        )
+        if logger.is_enabled_for(logging.INFO):
+            logger.info(
+                "Preprocessing step completed",
+                step_name=step_name,
+                processing_time_ms=processing_time_ms,
+                input_hash=input_hash,
+                output_hash=output_hash,
+            )
 
         return processed_img, result
+
+    wrapper.is_preprocessing_step = True
     return wrapper
 
 class ImagePreprocessor:
@@ -68,66 +188,121 @@ class ImagePreprocessor:
     preprocessing strategy that can be combined into a pipeline.
     """
 
-    async def run_pipeline_on_list(
-        self, image_bytes_list: List[bytes], pipeline: Optional[List[str]] = None
-    ) -> Tuple[List[bytes], List[List[ProcessingStepResult]]]:
-        """
-        Runs a configurable preprocessing pipeline on a list of image bytes.
-        """
-        if pipeline is None:
-            pipeline = ["deskew", "to_grayscale", "enhance_contrast", "binarize_adaptive"]
-
-        tasks = [self.run_pipeline(image_bytes, pipeline) for image_bytes in image_bytes_list]
-        results = await asyncio.gather(*tasks)
-        
-        final_images = [await asyncio.to_thread(self._cv2_to_bytes, res[0]) for res in results]
-        all_pages_results = [res[1] for res in results]
-            
-        return final_images, all_pages_results
-
     async def run_pipeline(
         self, image_bytes: bytes, pipeline: List[str]
     ) -> Tuple[np.ndarray, List[ProcessingStepResult]]:
         """
         Runs a configurable preprocessing pipeline on a single image.
         """
-        img = await asyncio.to_thread(self._bytes_to_cv2, image_bytes)
-        processing_results = []
+        return await self._run_steps(image_bytes, self._resolve_pipeline(pipeline))
 
+    def _resolve_pipeline(self, pipeline: List[str]) -> List[Callable[..., Any]]:
+        """
+        Resolves step names to step functions once per pipeline run. Unknown
+        steps are logged and skipped.
+        """
+        steps = []
         for step in pipeline:
-            if hasattr(self, step):
-                method = getattr(self, step)
-                img, result = await method(img)
-                processing_results.append(result)
-            else:
-                logger.warning(f"Preprocessing step '{step}' not found. Skipping.")
+            step_func = self._steps.get(step)
+            if step_func is None:
+                logger.warning("Preprocessing step not found. Skipping.", step_name=step)
+                continue
+            steps.append(step_func)
+        return steps
+
+    async def _run_steps(
+        self, image_bytes: bytes, steps: List[Callable[..., Any]]
+    ) -> Tuple[np.ndarray, List[ProcessingStepResult]]:
+        """Runs already-resolved preprocessing steps on a single image."""
+        img = await asyncio.to_thread(self._load_image, image_bytes)
+        processing_results = []
+
+        for step_func in steps:
+            img, result = await step_func(self, img)
+            processing_results.append(result)
 
         return img, processing_results
 
+    def _load_image(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Decodes an image for the pipeline, downscaling it once up front if its
+        longest side exceeds `PREPROCESSING_MAX_DIMENSION`. Every step's cost
+        scales with pixel count, and the VLM resizes large inputs anyway.
+        """
+        img = self._bytes_to_cv2(image_bytes)
+        max_dim = settings.PREPROCESSING_MAX_DIMENSION
+        longest = max(img.shape[:2])
+        if max_dim > 0 and longest > max_dim:
+            scale = max_dim / longest
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return img
+
     def _bytes_to_cv2(self, image_bytes: bytes) -> np.ndarray:
-        """Converts image bytes to a cv2 image."""
-        image = Image.open(io.BytesIO(image_bytes))
+        """
+        Converts image bytes to a cv2 image.
+
+        OpenCV decodes straight to BGR from a zero-copy view of the bytes; PIL
+        is only used for formats OpenCV cannot read.
+        """
+        img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            return img
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
-    def _cv2_to_bytes(self, img: np.ndarray) -> bytes:
-        """Converts a cv2 image back to bytes."""
-        is_success, buffer = cv2.imencode(".jpg", img)
+    def _trace_image(self, img: np.ndarray) -> Tuple[str, str]:
+        """
+        Returns `(hash, base64_preview)` for a step trace. With previews disabled
+        the raw pixel buffer is hashed directly and no JPEG is encoded.
+        """
+        if not settings.STEP_TRACE_PREVIEWS:
+            return content_hexdigest(np.ascontiguousarray(img).data), ""
+        encoded = self._cv2_to_bytes(img, quality=settings.STEP_TRACE_JPEG_QUALITY)
+        return content_hexdigest(encoded), b64encode_str(encoded)
+
+    def _cv2_to_bytes(self, img: np.ndarray, quality: Optional[int] = None) -> bytes:
+        """Converts a cv2 image back to JPEG bytes, at OpenCV's default quality unless given."""
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality is not None else []
+        is_success, buffer = cv2.imencode(".jpg", img, params)
         if not is_success:
             raise ValueError("Could not convert processed image back to bytes.")
         return buffer.tobytes()
 
+    async def _run_cheap(self, func: Callable[..., np.ndarray], img: np.ndarray, *args, **kwargs) -> np.ndarray:
+        """
+        Runs a cheap OpenCV call inline when the image is small enough that a
+        thread hand-off would cost more than the call itself, and on a worker
+        thread otherwise.
+        """
+        if img.shape[0] * img.shape[1] <= settings.INLINE_STEP_MAX_PIXELS:
+            return func(img, *args, **kwargs)
+        return await asyncio.to_thread(func, img, *args, **kwargs)
+
     @instrument_step
     async def deskew(self, img: np.ndarray, **kwargs) -> np.ndarray:
         """
         Deskews an image using the Radon transform.
         """
-        return await asyncio.to_thread(self._deskew_sync, img, **kwargs)
+        pool = _get_deskew_pool()
+        if pool is None:
+            return await asyncio.to_thread(self._deskew_sync, img, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, functools.partial(self._deskew_sync, img, **kwargs)
+        )
 
     def _deskew_sync(self, img: np.ndarray, **kwargs) -> np.ndarray:
-        grayscale = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
+        # Deskew may run after to_grayscale, in which case there is nothing to convert.
+        grayscale = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        # The skew angle does not depend on scale, and the Radon transform costs
+        # O(angles x diagonal^2), so estimate it on a reduced copy of the page.
+        max_dim = settings.DESKEW_ANALYSIS_MAX_DIM
+        if max_dim > 0 and max(grayscale.shape) > max_dim:
+            scale = max_dim / max(grayscale.shape)
+            grayscale = cv2.resize(grayscale, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
         (h, w) = grayscale.shape
-        diagonal = int(np.ceil(np.sqrt(h**2 + w**2)))
+        diagonal = math.ceil(math.hypot(h, w))
         pad_top = (diagonal - h) // 2
         pad_bottom = diagonal - h - pad_top
         pad_left = (diagonal - w) // 2
@@ -136,7 +311,14 @@ class ImagePreprocessor:
         padded_gray = cv2.copyMakeBorder(grayscale, pad_top, pad_bottom, pad_left, pad_right, 
                                          cv2.BORDER_CONSTANT, value=0)
 
-        I = cv2.Canny(padded_gray, 50, 200, apertureSize=3)
+        if settings.DESKEW_AUTO_CANNY:
+            # Derive thresholds from the page's median brightness so dim or
+            # washed-out scans still yield edges on the first pass.
+            median = float(np.median(grayscale))
+            low, high = int(max(0, 0.67 * median)), int(min(255, 1.33 * median))
+        else:
+            low, high = 50, 200
+        I = cv2.Canny(padded_gray, low, high, apertureSize=3)
 
         radius = diagonal // 2
         center = (diagonal // 2, diagonal // 2)
@@ -161,28 +343,27 @@ class ImagePreprocessor:
         """
         Converts an image to grayscale. Reduces complexity and noise.
         """
-        return await asyncio.to_thread(cv2.cvtColor, img, cv2.COLOR_BGR2GRAY)
+        return await self._run_cheap(cv2.cvtColor, img, cv2.COLOR_BGR2GRAY)
 
     @instrument_step
     async def enhance_contrast(self, img: np.ndarray, **kwargs) -> np.ndarray:
         """
         Enhances contrast using CLAHE (Contrast Limited Adaptive Histogram Equalization).
         """
-        return await asyncio.to_thread(self._enhance_contrast_sync, img, **kwargs)
+        return await self._run_cheap(self._enhance_contrast_sync, img, **kwargs)
 
     def _enhance_contrast_sync(self, img: np.ndarray, **kwargs) -> np.ndarray:
         if len(img.shape) > 2 and img.shape[2] > 1:
             img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        return clahe.apply(img)
+        return _get_clahe().apply(img)
 
     @instrument_step
     async def binarize_adaptive(self, img: np.ndarray, **kwargs) -> np.ndarray:
         """
         Applies adaptive thresholding to create a binary image.
         """
-        return await asyncio.to_thread(self._binarize_adaptive_sync, img, **kwargs)
+        return await self._run_cheap(self._binarize_adaptive_sync, img, **kwargs)
 
     def _binarize_adaptive_sync(self, img: np.ndarray, **kwargs) -> np.ndarray:
         if len(img.shape) > 2 and img.shape[2] > 1:
@@ -195,6 +376,31 @@ class ImagePreprocessor:
     @instrument_step
     async def denoise(self, img: np.ndarray, **kwargs) -> np.ndarray:
         """
-        Applies non-local means denoising to reduce noise while preserving edges.
+        Reduces noise while preserving edges.
+
+        Uses a bilateral filter by default. Non-local means (`DENOISE_ALGORITHM=nlm`)
+        gives slightly cleaner backgrounds at many times the cost per pixel.
         """
-        return await asyncio.to_thread(cv2.fastNlMeansDenoising, img, None, 10, 7, 21)
\ No newline at end of file
+        return await asyncio.to_thread(self._denoise_sync, img, **kwargs)
+
+    def _denoise_sync(self, img: np.ndarray, **kwargs) -> np.ndarray:
+        algorithm = kwargs.get("algorithm", settings.DENOISE_ALGORITHM)
+        # Transparent API: the same calls run as OpenCL kernels on a UMat.
+        src = cv2.UMat(img) if _opencl_enabled() else img
+        if algorithm == "bilateral":
+            denoised = cv2.bilateralFilter(src, 9, 75, 75)
+        elif algorithm == "nlm":
+            denoised = cv2.fastNlMeansDenoising(src, None, 10, 7, 21)
+        else:
+            raise ValueError(f"Unknown denoise algorithm: '{algorithm}'.")
+        return denoised.get() if isinstance(denoised, cv2.UMat) else denoised
+
+
+# --- Step Registry ---
+# Built once at import so pipelines resolve each step with a single dict lookup,
+# and only instrumented steps (not arbitrary attributes) can be invoked by name.
+ImagePreprocessor._steps = {
+    name: attr
+    for name, attr in vars(ImagePreprocessor).items()
+    if getattr(attr, "is_preprocessing_step", False)
+}
@@ -1,15 +1,27 @@
-import base64
-import hashlib
 import concurrent.futures
+import logging
+from collections import OrderedDict
 
+from app.core.config import settings
+from app.core.context import is_debug_trace_enabled
 from app.domain.models import ImageProcessingRequest, ImageProcessingResponse, ProcessingGearResult
 from app.services.gear_factory import create_gears
+from app.services.encoding import b64decode, content_hexdigest
+from app.services.processing_gears.base import ProcessingGear
 import structlog
 import asyncio
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 logger = structlog.get_logger(__name__)
 
+# --- Gear Result Cache ---
+# Gears are deterministic for a given image, step list and trace setting, so
+# results are memoized across requests in a small LRU keyed on the image hash.
+GearCacheKey = Tuple[str, Optional[Tuple[str, ...]], str, bool]
+_gear_result_cache: "OrderedDict[GearCacheKey, ProcessingGearResult]" = OrderedDict()
+# Runs currently in progress, so concurrent identical requests await one result.
+_gear_inflight: "Dict[GearCacheKey, asyncio.Future]" = {}
+
 class ImageProcessingService:
     """
     Orchestrates the execution of a dynamic pipeline of processing gears.
@@ -20,29 +32,60 @@ class ImageProcessingService:
 
     async def process_image(self, request: ImageProcessingRequest) -> ImageProcessingResponse:
         """
-        Processes a single image using a dynamically selected set of gears.
+        Processes a single base64-encoded image using a dynamically selected set of gears.
+        """
+        # Decoding a multi-megabyte payload is kept off the event loop.
+        image_data = await asyncio.to_thread(b64decode, request.image_data)
+        return await self.process_image_bytes(
+            image_data,
+            gears_to_run=request.gears_to_run,
+            preprocessing_steps=request.preprocessing_steps,
+            document_id=request.document_id,
+        )
+
+    async def process_image_bytes(
+        self,
+        image_data: bytes,
+        gears_to_run: List[str],
+        preprocessing_steps: Optional[List[str]] = None,
+        document_id: Optional[str] = None,
+    ) -> ImageProcessingResponse:
         """
-        log_context = {"gears_to_run": request.gears_to_run}
-        if request.document_id:
-            log_context["document_id"] = request.document_id
+        Processes raw image bytes using a dynamically selected set of gears.
 
-        logger.info("Received request to process image", **log_context)
+        In-process callers that already hold decoded bytes (e.g. rendered PDF
+        pages) use this directly and avoid a base64 encode/decode round-trip.
+        """
+        log_context = {"gears_to_run": gears_to_run}
+        if document_id:
+            log_context["document_id"] = document_id
+
+        # Checked once per image; the info events below run once per page.
+        log_info = logger.is_enabled_for(logging.INFO)
+        if log_info:
+            logger.info("Received request to process image", **log_context)
 
         try:
-            image_data = base64.b64decode(request.image_data)
-            image_id = hashlib.md5(image_data).hexdigest()
+            image_id = await asyncio.to_thread(content_hexdigest, image_data)
             log_context["image_id"] = image_id
 
             # Simplified gear creation, removing the problematic config
-            gear_configs = {gear_name: {} for gear_name in request.gears_to_run}
+            gear_configs = {gear_name: {} for gear_name in gears_to_run}
             gears = create_gears(gear_configs)
 
-            # Pass preprocessing_steps to the process method
-            tasks = [
-                gear.process(image_data, pipeline_steps=request.preprocessing_steps)
-                for gear in gears
-            ]
-            results: list[ProcessingGearResult] = await asyncio.gather(*tasks)
+            # Pass preprocessing_steps to the process method. A failing gear
+            # cancels its siblings instead of letting them run to completion.
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [
+                        tg.create_task(
+                            self._run_gear(gear, image_data, image_id, preprocessing_steps)
+                        )
+                        for gear in gears
+                    ]
+            except ExceptionGroup as eg:
+                raise eg.exceptions[0]
+            results: list[ProcessingGearResult] = [task.result() for task in tasks]
 
             response = ImageProcessingResponse(
                 image_id=image_id,
@@ -50,7 +93,8 @@ class ImageProcessingService:
                 results=results,
             )
 
-            logger.info("Image processing completed successfully", **log_context)
+            if log_info:
+                logger.info("Image processing completed successfully", **log_context)
             return response
 
         except Exception as e:
@@ -59,4 +103,67 @@ class ImageProcessingService:
                 exc_info=True,
                 **log_context,
             )
-            raise
\ No newline at end of file
+            raise
+
+    async def _run_gear(
+        self,
+        gear: ProcessingGear,
+        image_data: bytes,
+        image_id: str,
+        pipeline_steps: Optional[List[str]],
+    ) -> ProcessingGearResult:
+        """
+        Runs a single gear, serving repeated images from the result cache.
+
+        Identical images arriving concurrently (e.g. duplicate pages in one PDF)
+        share a single in-flight run instead of each missing the cache.
+        """
+        key: GearCacheKey = (
+            gear.gear_name,
+            tuple(pipeline_steps) if pipeline_steps is not None else None,
+            image_id,
+            settings.CAPTURE_STEP_TRACES or is_debug_trace_enabled(),
+        )
+        cached = _gear_result_cache.get(key)
+        if cached is not None:
+            _gear_result_cache.move_to_end(key)
+            if logger.is_enabled_for(logging.INFO):
+                logger.info("Gear result served from cache", gear_name=gear.gear_name, image_id=image_id)
+            # Never hand out the cached instance itself; callers own their results,
+            # including the result_data dict they may fill in further.
+            return cached.model_copy(deep=True)
+
+        inflight = _gear_inflight.get(key)
+        if inflight is not None:
+            try:
+                return (await asyncio.shield(inflight)).model_copy(deep=True)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # This caller was cancelled, not the shared run.
+                # The run we were waiting on was cancelled; do the work ourselves.
+
+        future = asyncio.get_running_loop().create_future()
+        _gear_inflight[key] = future
+        try:
+            result = await gear.process(image_data, pipeline_steps=pipeline_steps)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved; this caller re-raises it below.
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            if _gear_inflight.get(key) is future:
+                del _gear_inflight[key]
+
+        cache_size = settings.GEAR_RESULT_CACHE_SIZE
+        if cache_size > 0:
+            # Cache a private copy so changes the caller makes to `result` don't
+            # leak into later hits.
+            _gear_result_cache[key] = result.model_copy(deep=True)
+            while len(_gear_result_cache) > cache_size:
+                _gear_result_cache.popitem(last=False)
+        return result
@@ -1,12 +1,125 @@
 import fitz  # PyMuPDF
 from PIL import Image
 import io
-from typing import List, Tuple, Optional
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+import simplejpeg
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Generator, Iterator, List, Tuple, Optional, Sequence
+from app.core.config import settings
 from app.domain.models import PageMetadata
+from app.services.encoding import content_hexdigest
+
+# JPEG encoding goes through simplejpeg (libjpeg-turbo) straight from pixel
+# buffers. Quality and 4:2:0 subsampling match PIL's defaults, so output size
+# is unchanged from the previous PIL encoder.
+_JPEG_QUALITY = 75
+_JPEG_SUBSAMPLING = "420"
+
+def _encode_jpeg(pixels: np.ndarray) -> bytes:
+    """Encodes an RGB or single-channel (H, W, 1) uint8 array to JPEG."""
+    if pixels.shape[2] == 1:
+        return simplejpeg.encode_jpeg(pixels, quality=_JPEG_QUALITY, colorspace="GRAY")
+    return simplejpeg.encode_jpeg(
+        pixels, quality=_JPEG_QUALITY, colorspace="RGB", colorsubsampling=_JPEG_SUBSAMPLING
+    )
+
+# --- Render Process Pool ---
+# MuPDF is not thread-safe, so pages are rasterized in parallel across worker
+# processes (PDF_RENDER_PROCESSES > 0), each opening its own copy of the document.
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    global _render_pool
+    if _render_pool is None and settings.PDF_RENDER_PROCESSES > 0:
+        _render_pool = ProcessPoolExecutor(max_workers=settings.PDF_RENDER_PROCESSES)
+    return _render_pool
+
+def shutdown_render_pool() -> None:
+    """Stops the PDF render worker processes, if any were started."""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(cancel_futures=True)
+        _render_pool = None
+
+def _render_matrix(dpi: int) -> fitz.Matrix:
+    """Scale matrix for rendering at `dpi` (PDF user space is 72 dpi)."""
+    zoom = dpi / 72
+    return fitz.Matrix(zoom, zoom)
+
+def _render_page(
+    doc: fitz.Document,
+    page_num: int,
+    matrix: fitz.Matrix,
+    max_edge: int = 0,
+    grayscale: bool = False,
+) -> Tuple[bytes, PageMetadata]:
+    """
+    Renders one 0-indexed page to JPEG bytes with its metadata.
+
+    If `max_edge` is set, oversized pages (posters, drawings) are rendered at a
+    lower zoom so their longest side fits, rather than rasterized in full and
+    downscaled later. `grayscale` renders a single channel, a third of the
+    bytes to rasterize and encode, for text-only pipelines.
+    """
+    page = doc.load_page(page_num)
+    if max_edge > 0:
+        longest_pt = max(page.rect.width, page.rect.height)
+        if longest_pt * matrix.a > max_edge:
+            zoom = max_edge / longest_pt
+            matrix = fitz.Matrix(zoom, zoom)
+    # No alpha channel: pages are encoded as JPEG, which would drop it anyway.
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pixmap = page.get_pixmap(matrix=matrix, colorspace=colorspace, alpha=False)
+    # Encode the pixmap's samples in place; no PIL image or BytesIO.
+    # samples_mv is a view of MuPDF's buffer, where samples would copy it.
+    pixels = np.frombuffer(pixmap.samples_mv, dtype=np.uint8).reshape(
+        pixmap.height, pixmap.width, pixmap.n
+    )
+    image_bytes = _encode_jpeg(pixels)
+
+    page_metadata = PageMetadata(
+        page_number=page_num + 1,
+        image_size_bytes=len(image_bytes),
+        image_format="JPEG",
+        image_dimensions=(pixmap.width, pixmap.height),
+    )
+    return image_bytes, page_metadata
+
+def _render_pages(
+    pdf_bytes: bytes, page_nums: Sequence[int], dpi: int, max_edge: int, grayscale: bool
+) -> List[Tuple[bytes, PageMetadata]]:
+    """Worker entry point: opens the document once and renders a run of pages."""
+    matrix = _render_matrix(dpi)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [
+            _render_page(doc, page_num, matrix, max_edge, grayscale) for page_num in page_nums
+        ]
+
+# --- Rendered Page Cache ---
+# Retries and re-runs of the same PDF skip rasterization. Keyed by a hash of
+# the document, the 0-indexed page and the render settings; pages are iterated
+# on worker threads, hence the lock.
+PageCacheKey = Tuple[str, int, int, int, bool]
+_page_cache: "OrderedDict[PageCacheKey, Tuple[bytes, PageMetadata]]" = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+def _store_page(key: PageCacheKey, page: Tuple[bytes, PageMetadata]) -> None:
+    with _page_cache_lock:
+        _page_cache[key] = page
+        while len(_page_cache) > settings.PDF_PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
 
 class PDFProcessor:
-    def __init__(self, dpi: int = 300):
+    def __init__(self, dpi: int = 150, max_edge: int = 2048, grayscale: bool = False):
         self.dpi = dpi
+        # Longest side, in pixels, of a rendered page; 0 renders at `dpi` as is.
+        self.max_edge = max_edge
+        # Render single-channel pages, for pipelines that only need the text.
+        self.grayscale = grayscale
 
     def pdf_to_images(
         self, pdf_bytes: bytes, page_numbers: Optional[List[int]] = None
@@ -14,59 +127,127 @@ class PDFProcessor:
         """
         Converts a PDF file in bytes to a list of JPEG image bytes and generates metadata.
         If page_numbers is provided, only those pages are converted.
+
+        This is blocking, CPU-bound work; async callers should run it in a thread.
         """
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            _, pages = self.pdf_to_images_iter(pdf_bytes, page_numbers)
             image_bytes_list = []
             page_metadata_list = []
-
-            pages_to_process = []
-            if page_numbers:
-                total_pages = len(doc)
-                # Validate page numbers (must be 1-indexed)
-                for pn in page_numbers:
-                    if not 1 <= pn <= total_pages:
-                        raise ValueError(
-                            f"Invalid page number: {pn}. Document has {total_pages} pages."
-                        )
-                pages_to_process = [p - 1 for p in page_numbers]  # Convert to 0-indexed
-            else:
-                pages_to_process = range(len(doc))
-
-            for page_num in pages_to_process:
-                page = doc.load_page(page_num)
-                pixmap = page.get_pixmap(dpi=self.dpi)
-                img = Image.frombytes(
-                    "RGB", [pixmap.width, pixmap.height], pixmap.samples
-                )
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format="JPEG")
-                image_bytes = img_byte_arr.getvalue()
+            for image_bytes, page_metadata in pages:
                 image_bytes_list.append(image_bytes)
-
-                page_metadata = PageMetadata(
-                    page_number=page_num + 1,
-                    image_size_bytes=len(image_bytes),
-                    image_format="JPEG",
-                    image_dimensions=img.size,
-                )
                 page_metadata_list.append(page_metadata)
-
-            doc.close()
             return image_bytes_list, page_metadata_list
         except Exception as e:
             # In a real enterprise app, you'd have structured logging here
             print(f"An error occurred during PDF processing: {e}")
             raise
 
+    def pdf_to_images_iter(
+        self, pdf_bytes: bytes, page_numbers: Optional[List[int]] = None
+    ) -> Tuple[int, Generator[Tuple[bytes, PageMetadata], None, None]]:
+        """
+        Lazily converts a PDF to JPEG pages, in page order.
+
+        The document is opened and `page_numbers` validated eagerly; the returned
+        `(page_count, pages)` iterator then renders each page only when it is
+        requested, so consumers can start work on page 1 before page N exists.
+        The iterator is not thread-safe: advance it from one thread at a time,
+        and close() it when done early, which closes the document.
+        """
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            pages_to_process = self._select_pages(doc, page_numbers)
+        except Exception:
+            doc.close()
+            raise
+        return len(pages_to_process), self._render(doc, pdf_bytes, pages_to_process)
+
+    def _select_pages(self, doc: fitz.Document, page_numbers: Optional[List[int]]) -> List[int]:
+        """Validates 1-indexed page numbers and returns them 0-indexed."""
+        total_pages = len(doc)
+        if not page_numbers:
+            return list(range(total_pages))
+        # Validate page numbers (must be 1-indexed)
+        for pn in page_numbers:
+            if not 1 <= pn <= total_pages:
+                raise ValueError(
+                    f"Invalid page number: {pn}. Document has {total_pages} pages."
+                )
+        return [p - 1 for p in page_numbers]  # Convert to 0-indexed
+
+    def _render(
+        self, doc: fitz.Document, pdf_bytes: bytes, pages_to_process: List[int]
+    ) -> Generator[Tuple[bytes, PageMetadata], None, None]:
+        try:
+            if settings.PDF_PAGE_CACHE_SIZE <= 0:
+                yield from self._render_uncached(doc, pdf_bytes, pages_to_process)
+                return
+
+            pdf_digest = content_hexdigest(pdf_bytes)
+            keys = {
+                page_num: (pdf_digest, page_num, self.dpi, self.max_edge, self.grayscale)
+                for page_num in pages_to_process
+            }
+            cached = {}
+            with _page_cache_lock:
+                for page_num, key in keys.items():
+                    hit = _page_cache.get(key)
+                    if hit is not None:
+                        _page_cache.move_to_end(key)
+                        cached[page_num] = hit
+
+            rendered = self._render_uncached(
+                doc, pdf_bytes, [p for p in pages_to_process if p not in cached]
+            )
+            for page_num in pages_to_process:
+                page = cached.get(page_num)
+                if page is None:
+                    page = next(rendered)
+                    _store_page(keys[page_num], page)
+                yield page
+        finally:
+            doc.close()
+
+    def _render_uncached(
+        self, doc: fitz.Document, pdf_bytes: bytes, pages_to_process: List[int]
+    ) -> Iterator[Tuple[bytes, PageMetadata]]:
+        pool = _get_render_pool()
+        if pool is None or len(pages_to_process) < 2:
+            matrix = _render_matrix(self.dpi)
+            for page_num in pages_to_process:
+                yield _render_page(doc, page_num, matrix, self.max_edge, self.grayscale)
+            return
+
+        # Short contiguous runs of pages, so each worker opens the PDF once per
+        # run while results still start arriving before the whole document is done.
+        run_length = math.ceil(len(pages_to_process) / (settings.PDF_RENDER_PROCESSES * 4))
+        runs = [
+            pages_to_process[i:i + run_length]
+            for i in range(0, len(pages_to_process), run_length)
+        ]
+        for rendered in pool.map(
+            _render_pages,
+            repeat(pdf_bytes),
+            runs,
+            repeat(self.dpi),
+            repeat(self.max_edge),
+            repeat(self.grayscale),
+        ):
+            yield from rendered
+
     def crop_image(self, image_bytes: bytes, bbox: 'BoundingBox') -> bytes:
         """
         Crops an image based on a bounding box.
         The bounding box coordinates are assumed to be normalized (0.0 to 1.0).
         """
         try:
-            img = Image.open(io.BytesIO(image_bytes))
-            width, height = img.size
+            if simplejpeg.is_jpeg(image_bytes):
+                img = simplejpeg.decode_jpeg(image_bytes, colorspace="RGB")
+            else:
+                # PNG and other formats, or anything libjpeg-turbo rejects.
+                img = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+            height, width = img.shape[:2]
 
             # Denormalize coordinates
             left = int(bbox.x0 * width)
@@ -74,11 +255,9 @@ class PDFProcessor:
             right = int(bbox.x1 * width)
             bottom = int(bbox.y1 * height)
 
-            cropped_img = img.crop((left, top, right, bottom))
-
-            img_byte_arr = io.BytesIO()
-            cropped_img.save(img_byte_arr, format="JPEG")
-            return img_byte_arr.getvalue()
+            # Slicing is a view; ascontiguousarray makes the one copy the encoder needs.
+            cropped_img = np.ascontiguousarray(img[top:bottom, left:right])
+            return _encode_jpeg(cropped_img)
         except Exception as e:
             print(f"An error occurred during image cropping: {e}")
             raise
\ No newline at end of file
@@ -1,10 +1,10 @@
 import cv2
 import numpy as np
-import base64
 from typing import Dict, Any, List, Optional
 
 from app.core.pipeline_config import pipeline_config
 from app.domain.models import ProcessingGearResult
+from app.services.encoding import b64encode_str
 from app.services.image_preprocessor import ImagePreprocessor
 from app.services.processing_gears.base import ProcessingGear
 
@@ -43,11 +43,12 @@ class ImagePreprocessingGear(ProcessingGear):
 
         # Convert final NumPy image back to bytes for consistent output
         is_success, buffer = cv2.imencode(".jpg", processed_image_np)
+        del processed_image_np  # Release the decoded page before base64 encoding.
         if not is_success:
             # Enterprise-grade error handling
             raise RuntimeError("Failed to encode processed image to JPEG format.")
 
-        processed_image_b64 = base64.b64encode(buffer).decode('utf-8')
+        processed_image_b64 = b64encode_str(buffer)
 
         # The confidence score is 1.0 as this is a deterministic process.
         return ProcessingGearResult(
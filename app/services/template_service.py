@@ -1,7 +1,7 @@
 import json
 import os
 from typing import List
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 import structlog
 
 from app.domain.models import PipelineTemplate
@@ -9,13 +9,23 @@ from app.core.config import config
 
 logger = structlog.get_logger(__name__)
 
+# Built once so the whole template list is validated in a single pass.
+_template_list_adapter = TypeAdapter(List[PipelineTemplate])
+
 class TemplateService:
     """Manages loading and accessing pipeline templates."""
 
     def __init__(self, template_path: str = os.path.join(config.CONFIG_DIR, "pipeline_templates.json")):
         self._template_path = template_path
+        self._mtime = self._stat_mtime()
         self._templates = self._load_templates()
 
+    def _stat_mtime(self) -> float:
+        try:
+            return os.stat(self._template_path).st_mtime
+        except OSError:
+            return 0.0
+
     def _load_templates(self) -> List[PipelineTemplate]:
         """Loads and validates templates from the JSON file."""
         try:
@@ -23,7 +33,7 @@ class TemplateService:
                 data = json.load(f)
             
             # Use Pydantic for validation
-            templates = [PipelineTemplate(**item) for item in data]
+            templates = _template_list_adapter.validate_python(data)
             logger.info(f"Successfully loaded {len(templates)} pipeline templates.")
             return templates
         except FileNotFoundError:
@@ -37,5 +47,14 @@ class TemplateService:
             return []
 
     def get_all_templates(self) -> List[PipelineTemplate]:
-        """Returns all loaded pipeline templates."""
+        """
+        Returns all loaded pipeline templates.
+
+        The service lives for the whole process, so the file's mtime is checked
+        on each call and the templates are reloaded only after it changes.
+        """
+        mtime = self._stat_mtime()
+        if mtime and mtime != self._mtime:
+            self._mtime = mtime
+            self._templates = self._load_templates()
         return self._templates
\ No newline at end of file
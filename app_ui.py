@@ -12,12 +12,15 @@ CHAT_API_URL = "http://api:8000/api/chat"
 PIPELINE_TEMPLATES_URL = "http://api:8000/api/pipeline-templates"
 MAX_PAGES = 50
 
+# One session for all API calls, so requests reuse keep-alive connections.
+session = requests.Session()
+
 # --- Backend API Functions ---
 
 def get_pipeline_templates():
     """Fetches pipeline templates from the API."""
     try:
-        response = requests.get(PIPELINE_TEMPLATES_URL)
+        response = session.get(PIPELINE_TEMPLATES_URL)
         if response.status_code == 200:
             templates = response.json()
             return templates, gr.update(choices=[template['name'] for template in templates])
@@ -41,7 +44,6 @@ def process_document(file, prompt_text, pipeline_steps, chatbot, *selected_pages
         yield chatbot, gr.update(interactive=True), []
         return
 
-    files = {"pdf_file": (file.name, open(file.name, "rb"), "application/pdf")}
     data = {
         "text_prompt": prompt_text,
         "page_numbers": ",".join(map(str, page_numbers)),
@@ -55,7 +57,9 @@ def process_document(file, prompt_text, pipeline_steps, chatbot, *selected_pages
 
     gallery_images = []
     try:
-        response = requests.post(API_URL, files=files, data=data)
+        with open(file.name, "rb") as pdf_file:
+            files = {"pdf_file": (file.name, pdf_file, "application/pdf")}
+            response = session.post(API_URL, files=files, data=data)
         response.raise_for_status()
         response_data = response.json()
         bot_message = response_data.get("response", "Sorry, I couldn't process that.")
@@ -70,7 +74,7 @@ def process_document(file, prompt_text, pipeline_steps, chatbot, *selected_pages
                 metadata = step_result['metadata']
                 caption = (
                     f"**Step:** {metadata['step_name']}\n"
-                    f"**Time:** {metadata['processing_time_ms']:.2f} ms\n"
+                    f"**Time:** {metadata['processing_time_ms']} ms\n"
                     f"**Params:** {metadata['parameters']}"
                 )
                 gallery_images.append((output_img_data, caption))
@@ -89,7 +93,7 @@ def chat_with_api(message, history):
     """Sends a chat message to the backend and gets a response."""
     history = history or []
     try:
-        response = requests.post(CHAT_API_URL, json={"prompt": message})
+        response = session.post(CHAT_API_URL, json={"prompt": message})
         response.raise_for_status()
         response_data = response.json()
         bot_message = response_data.get("message", {}).get("content", "Sorry, I couldn't process that.")
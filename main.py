@@ -1,20 +1,25 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.api.endpoints import router as api_router
 from app.core.logging import configure_logging
 from app.core.limiter import limiter
 from app.core.security import SecurityHeadersMiddleware
 from app.core.cache import init_cache, close_cache
+from app.infrastructure.dip_client import close_http_client
+from app.services.image_preprocessor import shutdown_deskew_pool
+from app.services.encoding import b64_backend
+from app.services.pdf_processor import shutdown_render_pool
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette_prometheus import metrics, PrometheusMiddleware
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+import asyncio
 import structlog
-import uuid
-from app.domain.models import RequestContext
-from app.core.context import set_request_context
+from app.core.context import RequestContextMiddleware
 
 # Configure logging before creating the app instance
 configure_logging()
@@ -25,7 +30,10 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/api/v1/openapi.json"
+    openapi_url="/api/v1/openapi.json",
+    # Responses can carry many base64 page images; orjson renders them far
+    # faster than the stdlib json encoder.
+    default_response_class=ORJSONResponse,
 )
 
 # --- Middleware Configuration ---
@@ -46,15 +54,11 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def request_context_middleware(request: Request, call_next):
-    """Create a new request context and set it for the current request."""
-    correlation_id = request.headers.get("X-Correlation-ID") or str(uuid.uuid4())
-    context = RequestContext(correlation_id=correlation_id)
-    set_request_context(context)
-    response = await call_next(request)
-    response.headers["X-Correlation-ID"] = correlation_id
-    return response
+# Request context middleware (correlation ID, debug trace flag)
+app.add_middleware(RequestContextMiddleware)
+
+# Compress large responses (e.g. base64 step traces); small ones are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
 
 
 # Instrument FastAPI for OpenTelemetry
@@ -94,7 +98,11 @@ logger = structlog.get_logger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Application startup")
+    logger.info("Application startup", base64_backend=b64_backend())
+    # Coroutines that finish without suspending (e.g. cache hits, steps skipped
+    # for empty input) complete eagerly instead of being scheduled as tasks.
+    if hasattr(asyncio, "eager_task_factory"):  # Python 3.12+
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
     init_cache()
 
 
@@ -102,6 +110,9 @@ async def startup_event():
 async def shutdown_event():
     logger.info("Application shutdown")
     await close_cache()
+    await close_http_client()
+    shutdown_deskew_pool()
+    shutdown_render_pool()
 
 
 
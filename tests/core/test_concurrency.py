@@ -0,0 +1,78 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.core.concurrency import bounded_as_completed
+
+
+async def test_bounded_as_completed_limits_in_flight():
+    """Tests that no more than `limit` awaitables run at the same time."""
+    # Arrange
+    running = 0
+    peak = 0
+
+    async def job(value: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return value
+
+    # Act
+    jobs = (job(i) for i in range(10))
+    results = [r async for r in bounded_as_completed(jobs, limit=3)]
+
+    # Assert
+    assert sorted(results) == list(range(10))
+    assert peak == 3
+
+
+async def test_bounded_as_completed_cancels_on_failure():
+    """Tests that a failure propagates and cancels the work still in flight."""
+    # Arrange
+    cancelled = []
+
+    async def slow() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail() -> None:
+        raise RuntimeError("boom")
+
+    # Act / Assert
+    with pytest.raises(RuntimeError, match="boom"):
+        async for _ in bounded_as_completed([slow(), fail()], limit=2):
+            pass
+
+    assert cancelled == [True]
+
+
+async def test_bounded_as_completed_retrieves_sibling_failures():
+    """Tests that failures finishing alongside the raised one are still retrieved."""
+    # Arrange
+    loop = asyncio.get_running_loop()
+    unhandled = []
+    previous_handler = loop.get_exception_handler()
+    loop.set_exception_handler(lambda _, context: unhandled.append(context))
+
+    async def fail(message: str) -> None:
+        raise RuntimeError(message)
+
+    # Act
+    try:
+        with pytest.raises(RuntimeError):
+            failures = [fail("first"), fail("second")]
+            async for _ in bounded_as_completed(failures, limit=2):
+                pass
+        # Unretrieved task exceptions are reported when the task is collected.
+        gc.collect()
+    finally:
+        loop.set_exception_handler(previous_handler)
+
+    # Assert
+    assert unhandled == []
@@ -1,7 +1,11 @@
+from collections import OrderedDict
+
 import pytest
 from pytest_httpx import HTTPXMock
+from app.core.config import settings
+from app.infrastructure import dip_client as dip_client_module
 from app.infrastructure.dip_client import DIPClient
-from app.domain.models import DIPChatRequest, ChatMessage
+from app.domain.models import DIPChatRequest, DIPRequest, ChatMessage
 
 @pytest.fixture
 def dip_client() -> DIPClient:
@@ -37,4 +41,27 @@ async def test_chat_api_error(dip_client: DIPClient, httpx_mock: HTTPXMock):
     )
 
     with pytest.raises(Exception): # httpx raises an exception on 500
-        await dip_client.chat(chat_request)
\ No newline at end of file
+        await dip_client.chat(chat_request)
+
+async def test_generate_served_from_cache(
+    dip_client: DIPClient, httpx_mock: HTTPXMock, monkeypatch
+):
+    """Test that an identical generate request is answered without a second call."""
+    monkeypatch.setattr(settings, "DIP_RESPONSE_CACHE_SIZE", 4)
+    monkeypatch.setattr(dip_client_module, "_generate_cache", OrderedDict())
+    mock_response = {
+        "model": "qwen2.5vl:3b",
+        "created_at": "2023-10-26T15:00:00Z",
+        "response": "An invoice.",
+        "done": True,
+    }
+    httpx_mock.add_response(url=f"{dip_client.base_url}/api/generate", json=mock_response)
+
+    request = DIPRequest(model="qwen2.5vl:3b", prompt="What is this?", images=["aGVsbG8="])
+
+    first = await dip_client.generate(request)
+    second = await dip_client.generate(request)
+
+    assert first.response == second.response == "An invoice."
+    assert first is not second
+    assert len(httpx_mock.get_requests()) == 1
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+import pytest
+
+# The preprocessor is built on OpenCV; skip the module cleanly without it.
+pytest.importorskip("cv2")
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import image_preprocessor as image_preprocessor_module
+from app.services.image_preprocessor import ImagePreprocessor
+
+
+@pytest.fixture
+def step_cache(monkeypatch) -> OrderedDict:
+    """Enables the step cache with a fresh, test-local store."""
+    cache: OrderedDict = OrderedDict()
+    monkeypatch.setattr(settings, "STEP_CACHE_SIZE", 8)
+    monkeypatch.setattr(image_preprocessor_module, "_step_cache", cache)
+    return cache
+
+
+async def test_step_cache_misses_when_output_settings_change(step_cache, monkeypatch):
+    """Tests that changing a setting that affects step output bypasses stale entries."""
+    # Arrange
+    preprocessor = ImagePreprocessor()
+    img = np.random.default_rng(0).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+    monkeypatch.setattr(settings, "DENOISE_ALGORITHM", "bilateral")
+    bilateral, _ = await preprocessor.denoise(img)
+
+    # Act
+    repeated, _ = await preprocessor.denoise(img)
+    monkeypatch.setattr(settings, "DENOISE_ALGORITHM", "nlm")
+    nlm, _ = await preprocessor.denoise(img)
+
+    # Assert
+    assert repeated is bilateral  # Same settings: served from the cache.
+    assert len(step_cache) == 2
+    assert not np.array_equal(nlm, bilateral)
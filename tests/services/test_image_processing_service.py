@@ -1,10 +1,24 @@
 import base64
+from collections import OrderedDict
+
 import pytest
+
+# The preprocessing gear needs OpenCV; skip the module cleanly without it.
+pytest.importorskip("cv2")
+
+from app.core.config import settings
 from app.domain.models import ImageProcessingRequest
+from app.services import image_processing_service
 from app.services.image_processing_service import ImageProcessingService
 
 # A simple 1x1 white pixel PNG for testing
 WHITE_PIXEL_PNG_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/wcAAwAB/epv2AAAAABJRU5ErkJggg=="
+# Decoded once, for tests that exercise the raw-bytes entry point.
+WHITE_PIXEL_PNG = base64.b64decode(WHITE_PIXEL_PNG_B64)
+
+# Expected step sequences, as immutable module constants.
+EXPECTED_DEFAULT_OCR_STEPS = ("deskew", "to_grayscale", "enhance_contrast", "binarize_adaptive")
+DYNAMIC_STEPS = ("to_grayscale", "deskew")
 
 
 @pytest.fixture
@@ -13,7 +27,7 @@ def image_service() -> ImageProcessingService:
     return ImageProcessingService()
 
 
-def test_process_image_with_dynamic_pipeline(image_service: ImageProcessingService):
+async def test_process_image_with_dynamic_pipeline(image_service: ImageProcessingService):
     """Tests that the service can process an image using a dynamically specified pipeline."""
     # Arrange
     pipeline_name = "Default OCR"
@@ -22,10 +36,9 @@ def test_process_image_with_dynamic_pipeline(image_service: ImageProcessingServi
         gears_to_run=["image_preprocessor"],
         pipeline_name=pipeline_name
     )
-    expected_steps = ["deskew", "to_grayscale", "enhance_contrast", "binarize_adaptive"]
 
     # Act
-    response = image_service.process_image(req)
+    response = await image_service.process_image(req)
 
     # Assert
     assert response.results is not None
@@ -33,54 +46,80 @@ def test_process_image_with_dynamic_pipeline(image_service: ImageProcessingServi
     
     result = response.results[0]
     assert result.gear_name == "image_preprocessor"
-    assert result.status == "success"
-    assert result.result_data["preprocessing_steps"] == expected_steps
+    assert result.confidence_score == 1.0
+    step_names = [r.step_name for r in result.result_data["preprocessing_steps"]]
+    assert step_names == list(EXPECTED_DEFAULT_OCR_STEPS)
     assert "processed_image_b64" in result.result_data
 
 
-def test_process_image_with_dynamic_steps(image_service: ImageProcessingService):
-    """Tests that the service uses the dynamic preprocessing_steps when provided."""
-    # Arrange
-    dynamic_steps = ["to_grayscale", "deskew"]
-    req = ImageProcessingRequest(
-        image_data=WHITE_PIXEL_PNG_B64,
+@pytest.mark.parametrize(
+    "preprocessing_steps, expected_steps",
+    [
+        # Dynamic steps are used as given.
+        (DYNAMIC_STEPS, DYNAMIC_STEPS),
+        # No steps falls back to the gear's default OCR pipeline.
+        (None, EXPECTED_DEFAULT_OCR_STEPS),
+    ],
+    ids=["dynamic_steps", "no_steps"],
+)
+async def test_process_image_bytes_steps(
+    image_service: ImageProcessingService, preprocessing_steps, expected_steps
+):
+    """Tests that the service runs exactly the preprocessing_steps it is given."""
+    # Act
+    response = await image_service.process_image_bytes(
+        WHITE_PIXEL_PNG,
         gears_to_run=["image_preprocessor"],
-        preprocessing_steps=dynamic_steps,
-        pipeline_name="This should be ignored"
+        preprocessing_steps=None if preprocessing_steps is None else list(preprocessing_steps),
     )
 
-    # Act
-    response = image_service.process_image(req)
-
     # Assert
     assert response.results is not None
     assert len(response.results) == 1
     result = response.results[0]
     assert result.gear_name == "image_preprocessor"
-    assert result.status == "success"
-    # Verify that the dynamic steps were used, not the ones from any named pipeline
-    assert result.result_data["preprocessing_steps"] == dynamic_steps
+    assert result.confidence_score == 1.0
+    step_names = [r.step_name for r in result.result_data["preprocessing_steps"]]
+    assert step_names == list(expected_steps)
     assert "processed_image_b64" in result.result_data
 
 
-def test_process_image_with_no_steps(image_service: ImageProcessingService):
-    """Tests that the service handles requests with no preprocessing_steps gracefully."""
+async def test_process_image_steps_override_pipeline_name(image_service: ImageProcessingService):
+    """Tests that explicit preprocessing_steps win over a conflicting pipeline_name."""
     # Arrange
     req = ImageProcessingRequest(
         image_data=WHITE_PIXEL_PNG_B64,
         gears_to_run=["image_preprocessor"],
-        preprocessing_steps=None  # Explicitly None
+        preprocessing_steps=list(DYNAMIC_STEPS),
+        pipeline_name="This should be ignored",
     )
 
     # Act
-    response = image_service.process_image(req)
+    response = await image_service.process_image(req)
 
     # Assert
-    assert response.results is not None
-    assert len(response.results) == 1
     result = response.results[0]
     assert result.gear_name == "image_preprocessor"
-    assert result.status == "success"
-    # Expect an empty list of steps
-    assert result.result_data["preprocessing_steps"] == []
-    assert "processed_image_b64" in result.result_data
\ No newline at end of file
+    step_names = [r.step_name for r in result.result_data["preprocessing_steps"]]
+    assert step_names == list(DYNAMIC_STEPS)
+
+
+async def test_gear_result_cache_returns_copies(image_service: ImageProcessingService, monkeypatch):
+    """Tests that the cache never shares a result instance with its callers."""
+    # Arrange
+    monkeypatch.setattr(settings, "GEAR_RESULT_CACHE_SIZE", 4)
+    monkeypatch.setattr(image_processing_service, "_gear_result_cache", OrderedDict())
+
+    # Act
+    first = await image_service.process_image_bytes(WHITE_PIXEL_PNG, gears_to_run=["image_preprocessor"])
+    original_image_b64 = first.results[0].result_data["processed_image_b64"]
+    # The caller of the miss owns its result; changing it must not reach the cache.
+    first.results[0].result_data["processed_image_b64"] = "changed by the first caller"
+    second = await image_service.process_image_bytes(WHITE_PIXEL_PNG, gears_to_run=["image_preprocessor"])
+    second.results[0].result_data["processed_image_b64"] = "changed by the second caller"
+    third = await image_service.process_image_bytes(WHITE_PIXEL_PNG, gears_to_run=["image_preprocessor"])
+
+    # Assert
+    assert second.results[0] is not first.results[0]
+    assert third.results[0] is not second.results[0]
+    assert third.results[0].result_data["processed_image_b64"] == original_image_b64
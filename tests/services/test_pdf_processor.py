@@ -1,9 +1,18 @@
 import pytest
-from app.services.pdf_processor import PDFProcessor
+
+# Skip the module at collection time on machines without PyMuPDF.
+pytest.importorskip("fitz")
+
 import fitz  # PyMuPDF
 
-# Create a dummy PDF in memory for testing
-@pytest.fixture
+from app.core.config import settings
+from app.services import pdf_processor as pdf_processor_module
+from app.services.pdf_processor import PDFProcessor
+
+
+# Create a dummy PDF in memory for testing. The bytes are immutable, so one
+# document is built for the whole session.
+@pytest.fixture(scope="session")
 def dummy_pdf_bytes() -> bytes:
     doc = fitz.open()  # New empty PDF
     page = doc.new_page()
@@ -12,18 +21,64 @@ def dummy_pdf_bytes() -> bytes:
     doc.close()
     return pdf_bytes
 
-def test_pdf_to_images_success(dummy_pdf_bytes):
-    """Test that a valid PDF is converted into a list of image bytes."""
-    processor = PDFProcessor()
-    image_bytes_list = processor.pdf_to_images(dummy_pdf_bytes)
+@pytest.fixture(scope="session")
+def multi_page_pdf_bytes() -> bytes:
+    doc = fitz.open()
+    for page_number in range(1, 4):
+        doc.new_page().insert_text((50, 72), f"Page {page_number}")
+    pdf_bytes = doc.write()
+    doc.close()
+    return pdf_bytes
+
+@pytest.fixture(scope="session")
+def pdf_processor() -> PDFProcessor:
+    """PDFProcessor holds only render settings, so one instance serves every test."""
+    # 72 dpi is 1:1 with PDF points; the assertions don't depend on resolution.
+    return PDFProcessor(dpi=72)
+
+def test_pdf_to_images_success(pdf_processor: PDFProcessor, dummy_pdf_bytes):
+    """Test that a valid PDF is converted into image bytes plus per-page metadata."""
+    image_bytes_list, page_metadata_list = pdf_processor.pdf_to_images(dummy_pdf_bytes)
     assert isinstance(image_bytes_list, list)
     assert len(image_bytes_list) == 1
     assert isinstance(image_bytes_list[0], bytes)
     # A simple check to see if it looks like a JPEG
     assert image_bytes_list[0].startswith(b'\xff\xd8')
 
-def test_pdf_to_images_invalid_bytes():
+    assert len(page_metadata_list) == 1
+    page_metadata = page_metadata_list[0]
+    assert page_metadata.page_number == 1
+    assert page_metadata.image_size_bytes == len(image_bytes_list[0])
+    assert page_metadata.image_format == "JPEG"
+
+def test_pdf_to_images_invalid_bytes(pdf_processor: PDFProcessor):
     """Test that the processor handles invalid PDF bytes gracefully."""
-    processor = PDFProcessor()
     with pytest.raises(Exception):  # fitz raises a generic exception
-        processor.pdf_to_images(b"this is not a pdf")
\ No newline at end of file
+        pdf_processor.pdf_to_images(b"this is not a pdf")
+
+def test_pdf_to_images_iter_yields_pages_lazily(
+    pdf_processor: PDFProcessor, multi_page_pdf_bytes, monkeypatch
+):
+    """Test that each page is rendered only when the iterator reaches it."""
+    # Count real renders; the page cache would otherwise serve repeats.
+    monkeypatch.setattr(settings, "PDF_PAGE_CACHE_SIZE", 0)
+    rendered = []
+    render_page = pdf_processor_module._render_page
+
+    def counting_render_page(doc, page_num, *args):
+        rendered.append(page_num)
+        return render_page(doc, page_num, *args)
+
+    monkeypatch.setattr(pdf_processor_module, "_render_page", counting_render_page)
+
+    page_count, pages = pdf_processor.pdf_to_images_iter(multi_page_pdf_bytes)
+    assert page_count == 3
+    assert rendered == []  # Opening and validating renders nothing.
+
+    image_bytes, page_metadata = next(pages)
+    assert image_bytes.startswith(b'\xff\xd8')
+    assert page_metadata.page_number == 1
+    assert rendered == [0]  # Later pages are not rendered yet.
+
+    assert [metadata.page_number for _, metadata in pages] == [2, 3]
+    assert rendered == [0, 1, 2]
@@ -1,18 +1,38 @@
+import os
+
 import pytest
 from app.services.template_service import TemplateService
 from app.domain.models import PipelineTemplate
 
 
-def test_template_service_loads_templates():
-    """Tests that the TemplateService can successfully load pipeline templates."""
-    # Arrange
-    service = TemplateService()
+@pytest.fixture(scope="session")
+def template_service() -> TemplateService:
+    """The bundled templates are read-only test input, so they are loaded once."""
+    return TemplateService()
 
+
+def test_template_service_loads_templates(template_service: TemplateService):
+    """Tests that the TemplateService can successfully load pipeline templates."""
     # Act
-    templates = service.get_all_templates()
+    templates = template_service.get_all_templates()
 
     # Assert
     assert templates is not None
     assert isinstance(templates, list)
     assert len(templates) > 0
-    assert all(isinstance(t, PipelineTemplate) for t in templates)
\ No newline at end of file
+    assert all(isinstance(t, PipelineTemplate) for t in templates)
+
+def test_template_service_reloads_when_file_changes(tmp_path):
+    """Tests that edits to the templates file are picked up without a restart."""
+    # Arrange
+    template_file = tmp_path / "pipeline_templates.json"
+    template_file.write_text('[{"name": "a", "description": "A", "steps": []}]')
+    service = TemplateService(template_path=str(template_file))
+    assert [t.name for t in service.get_all_templates()] == ["a"]
+
+    # Act
+    template_file.write_text('[{"name": "b", "description": "B", "steps": []}]')
+    os.utime(template_file, (1, 1))
+
+    # Assert
+    assert [t.name for t in service.get_all_templates()] == ["b"]
@@ -1,13 +1,39 @@
-from fastapi.testclient import TestClient
-from main import app
+import asyncio
 import uuid
+from typing import AsyncGenerator
+
+import fitz
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.api.endpoints import _MAX_PAGE_NUMBER, _parse_page_numbers
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.domain.models import DIPResponse
+from app.infrastructure.dip_client import get_dip_client
+from app.services import pdf_processor as pdf_processor_module
+from main import app
+
+# The client below is shared by the whole module, so async tests that use it
+# run on the module's event loop.
+module_loop = pytest.mark.asyncio(loop_scope="module")
 
-client = TestClient(app)
 
-def test_generate_with_correlation_id():
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client() -> AsyncGenerator[httpx.AsyncClient, None]:
+    """Calls the app in-process on the module's event loop, with no thread bridge."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver"
+    ) as c:
+        yield c
+
+@module_loop
+async def test_generate_with_correlation_id(client: httpx.AsyncClient):
     """Test that the /generate endpoint includes the correlation_id in the response."""
     correlation_id = str(uuid.uuid4())
-    response = client.post(
+    response = await client.post(
         "/api/generate",
         headers={"X-Correlation-ID": correlation_id},
         json={"model": "test_model", "prompt": "test_prompt"},
@@ -16,12 +42,131 @@ def test_generate_with_correlation_id():
     # This is expected for now.
     assert response.status_code == 500
 
-def test_generate_without_correlation_id():
+@module_loop
+async def test_generate_without_correlation_id(client: httpx.AsyncClient):
     """Test that the /generate endpoint generates a correlation_id if not provided."""
-    response = client.post(
+    response = await client.post(
         "/api/generate",
         json={"model": "test_model", "prompt": "test_prompt"},
     )
     # The test will fail because the mock client is not set up.
     # This is expected for now.
-    assert response.status_code == 500
\ No newline at end of file
+    assert response.status_code == 500
+
+
+class StubDIPClient:
+    """Answers generate calls without a DIP service, reporting the image count."""
+
+    async def generate(self, request):
+        return DIPResponse(
+            model=request.model,
+            created_at="now",
+            response=f"{len(request.images or [])} images",
+            done=True,
+        )
+
+
+@pytest.fixture
+def stub_dip_client(monkeypatch):
+    # process_pdf is limited to 5 calls a minute; these tests make more.
+    monkeypatch.setattr(limiter, "enabled", False)
+    app.dependency_overrides[get_dip_client] = StubDIPClient
+    yield
+    app.dependency_overrides.pop(get_dip_client, None)
+
+
+def make_pdf(page_count: int) -> bytes:
+    doc = fitz.open()
+    for page_number in range(1, page_count + 1):
+        doc.new_page().insert_text((50, 72), f"Page {page_number}")
+    pdf_bytes = doc.write()
+    doc.close()
+    return pdf_bytes
+
+
+@module_loop
+async def test_process_pdf_preprocesses_selected_pages(
+    client: httpx.AsyncClient, stub_dip_client
+):
+    """Test that only the requested pages are preprocessed and sent on."""
+    response = await client.post(
+        "/api/process_pdf",
+        files={"pdf_file": ("doc.pdf", make_pdf(4), "application/pdf")},
+        data={"page_numbers": "1,3-4", "pipeline_steps": "to_grayscale"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["response"] == "3 images"
+
+
+@module_loop
+async def test_process_pdf_render_failure_returns_500(
+    client: httpx.AsyncClient, stub_dip_client, monkeypatch
+):
+    """Test that a page that fails to render fails the request instead of hanging it."""
+    # Several pages wait on the render lock while the first one fails.
+    monkeypatch.setattr(settings, "PREPROCESSING_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "PDF_PAGE_CACHE_SIZE", 0)
+
+    def failing_render_page(doc, page_num, *args):
+        raise RuntimeError(f"cannot render page {page_num}")
+
+    monkeypatch.setattr(pdf_processor_module, "_render_page", failing_render_page)
+
+    response = await asyncio.wait_for(
+        client.post(
+            "/api/process_pdf",
+            files={"pdf_file": ("doc.pdf", make_pdf(3), "application/pdf")},
+        ),
+        timeout=10,
+    )
+
+    assert response.status_code == 500
+    assert "cannot render page 0" in response.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    "page_numbers, expected",
+    [
+        ("1-3", (1, 2, 3)),
+        ("1,1", (1, 1)),
+        (" 2 , 4 - 5 ", (2, 4, 5)),
+        (str(_MAX_PAGE_NUMBER), (_MAX_PAGE_NUMBER,)),
+    ],
+)
+def test_parse_page_numbers(page_numbers: str, expected):
+    """Test that page lists expand ranges and keep the order and repeats given."""
+    assert _parse_page_numbers(page_numbers) == expected
+
+
+INVALID_PAGE_NUMBERS = [
+    "a",
+    "1-",
+    "0",
+    "3-1",
+    "1,",
+    str(_MAX_PAGE_NUMBER + 1),
+    f"1-{_MAX_PAGE_NUMBER + 1}",
+]
+
+
+@pytest.mark.parametrize("page_numbers", INVALID_PAGE_NUMBERS)
+def test_parse_page_numbers_rejects_invalid(page_numbers: str):
+    """Test that malformed, descending, zero and too-large page lists are rejected."""
+    with pytest.raises(ValueError):
+        _parse_page_numbers(page_numbers)
+
+
+@pytest.mark.parametrize("page_numbers", INVALID_PAGE_NUMBERS + ["4"])
+@module_loop
+async def test_process_pdf_invalid_page_numbers_returns_400(
+    client: httpx.AsyncClient, stub_dip_client, page_numbers: str
+):
+    """Test that bad page lists, including pages past the end, are client errors."""
+    response = await client.post(
+        "/api/process_pdf",
+        files={"pdf_file": ("doc.pdf", make_pdf(3), "application/pdf")},
+        data={"page_numbers": page_numbers},
+    )
+
+    assert response.status_code == 400